@@ -2,14 +2,21 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import array
+import functools
 import gc
 import gzip
+import hashlib
+import mmap
+import multiprocessing as mp
 import os
-import struct
+import sys
 import time
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
-from dataclasses import dataclass
-from typing import Iterable, List, Tuple, Optional, Set
+from itertools import accumulate, cycle, islice, repeat
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Tuple, Optional, Set
 
 # ---------- optional libs ----------
 try:
@@ -18,6 +25,27 @@ try:
 except Exception:
     HAS_IV2PY = False
 
+try:
+    import numpy as np  # vectorized naive scan
+    HAS_NUMPY = True
+except Exception:
+    HAS_NUMPY = False
+
+try:
+    import numba  # compiled SA binary search
+    from numba import njit, prange
+    HAS_NUMBA = True
+except Exception:
+    HAS_NUMBA = False
+
+    def njit(*args, **kwargs):
+        # plain-Python stand-in so the kernels below still define without numba
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda f: f
+
+    prange = range
+
 try:
     from pydivsufsort import divsufsort  # suffix array
     HAS_DIVSUFSORT = True
@@ -28,62 +56,233 @@ except Exception:
 # =========================================================
 # Globals for process workers (avoid pickling huge objects per task)
 # =========================================================
-_G_TEXT: Optional[str] = None
-_G_SA_BYTES: Optional[bytes] = None
-_G_SA_N: int = 0
+_G_TEXT_B: Optional[bytes] = None
+_G_TEXT_ARR = None  # np.ndarray[uint8] view of _G_TEXT_B (naive SIMD path)
+_G_TEXT_MV: Optional[memoryview] = None  # uint8 view of shared memory (SA pool path)
+_G_SA_MV: Optional[memoryview] = None  # uint32 ("I") view of the SA cache file / shared memory (SA pool path)
+_G_SHM: List[shared_memory.SharedMemory] = []  # keep attached blocks alive in the worker
+_G_Q_MV: Optional[memoryview] = None  # all queries, ASCII, back to back (shared memory)
+_G_Q_OFF: Optional[memoryview] = None  # int64 ("q") offsets into _G_Q_MV, len(queries) + 1 entries
 _G_QUERIES: Optional[List[str]] = None
+_G_FM: Optional["IVFM"] = None  # FM modes: inherited through fork, never pickled
+_G_REFERENCE: Optional[List[bytes]] = None
+_G_WEIGHTS: Optional[List[int]] = None
+_G_ERRORS: int = 0
+_G_HITS = None  # mp.Value("q"): pool workers add their range sums, the parent reads it after join
 
+# fork shares the parent's FM-index (C++ memory) copy-on-write; elsewhere FM modes stay on threads
+FM_USE_FORK = sys.platform.startswith("linux")
 
-def _init_text_queries_worker(text: str, queries: List[str]) -> None:
-    global _G_TEXT, _G_QUERIES
-    _G_TEXT = text
-    _G_QUERIES = queries
+
+def shared_copy(data) -> shared_memory.SharedMemory:
+    """
+    New shared-memory block holding a copy of data (any bytes-like object).
+    """
+    nbytes = memoryview(data).nbytes
+    shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+    shm.buf[:nbytes] = memoryview(data).cast("B")
+    return shm
+
+
+def release_shared(*blocks: shared_memory.SharedMemory) -> None:
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
+def share_queries(queries: List[str]) -> Tuple[shared_memory.SharedMemory, shared_memory.SharedMemory]:
+    """
+    Encode all queries once into one flat buffer + int64 offsets, both in shared memory,
+    so pool workers neither unpickle a list of strings nor re-encode per query.
+    """
+    qs_bytes = [q.encode("ascii") for q in queries]
+    offsets = array.array("q", accumulate(map(len, qs_bytes), initial=0))
+    return shared_copy(b"".join(qs_bytes)), shared_copy(offsets)
+
+
+def _attach_queries(q_shm: str, off_shm: str, n_queries: int) -> None:
+    global _G_Q_MV, _G_Q_OFF
+    shm_q = shared_memory.SharedMemory(name=q_shm)
+    shm_off = shared_memory.SharedMemory(name=off_shm)
+    _G_SHM.extend((shm_q, shm_off))
+    _G_Q_OFF = shm_off.buf[:8 * (n_queries + 1)].cast("q")
+    _G_Q_MV = shm_q.buf[:_G_Q_OFF[n_queries]]
+
+
+def _query_bytes(i: int) -> bytes:
+    # m-byte copy: bytes.find/count take memoryviews, but startswith and < need real bytes
+    return bytes(_G_Q_MV[_G_Q_OFF[i]:_G_Q_OFF[i + 1]])
+
+
+def _add_hits(s: int) -> None:
+    with _G_HITS.get_lock():
+        _G_HITS.value += s
 
 
-def _init_sa_worker(text: str, sa_bytes: bytes, sa_n: int, queries: List[str]) -> None:
-    global _G_TEXT, _G_SA_BYTES, _G_SA_N, _G_QUERIES
-    _G_TEXT = text
-    _G_SA_BYTES = sa_bytes
-    _G_SA_N = sa_n
+def drain_pool(pool, fn, ranges: List[Tuple[int, int]], workers: int) -> None:
+    """
+    Run fn over all ranges and wait for the pool to finish. Workers add their sums to the shared
+    counter themselves, so only chunk completion travels back to the parent.
+    """
+    pool.map_async(fn, ranges, chunksize=pool_chunksize(len(ranges), workers)).get()
+    pool.close()
+    pool.join()
+
+
+def _init_text_queries_worker(text: bytes, q_shm: str, off_shm: str, n_queries: int, hits) -> None:
+    global _G_TEXT_B, _G_TEXT_ARR, _G_HITS
+    _G_HITS = hits
+    # naive search scans bytes (CPython fastsearch on 1-byte units, no unicode kind dispatch)
+    _G_TEXT_B = text
+    _G_TEXT_ARR = np.frombuffer(_G_TEXT_B, dtype=np.uint8) if HAS_NUMPY else None
+    _attach_queries(q_shm, off_shm, n_queries)
+
+
+def _init_sa_worker(text_shm: str, text_n: int, sa_path: Optional[str], sa_shm: Optional[str], sa_n: int,
+                    q_shm: str, off_shm: str, n_queries: int, hits) -> None:
+    """
+    Attach the text / query shared-memory blocks created by the parent and the SA, either by mapping
+    the on-disk SA cache (page cache shared by all workers) or its shared-memory copy: views, not copies.
+    """
+    global _G_TEXT_MV, _G_SA_MV, _G_SHM, _G_HITS
+    _G_HITS = hits
+    shm_text = shared_memory.SharedMemory(name=text_shm)
+    _G_SHM = [shm_text]
+    # memoryviews index to plain ints and slice without copying (cheaper than numpy scalars here)
+    _G_TEXT_MV = shm_text.buf[:text_n]
+    if sa_path is not None:
+        _G_SA_MV = memoryview(np.memmap(sa_path, dtype=np.uint32, mode="r", shape=(sa_n,)))
+    else:
+        assert sa_shm is not None
+        shm_sa = shared_memory.SharedMemory(name=sa_shm)
+        _G_SHM.append(shm_sa)
+        _G_SA_MV = shm_sa.buf[:4 * sa_n].cast("I")
+    _attach_queries(q_shm, off_shm, n_queries)
+
+
+def _init_fm_worker(fm: "IVFM", reference: Optional[List[bytes]], queries: List[str],
+                    weights: Optional[List[int]], errors: int, hits) -> None:
+    """
+    Only used with the fork start method: initargs reach the child through fork, not pickle,
+    so this just rebinds the parent's objects.
+    """
+    global _G_FM, _G_REFERENCE, _G_QUERIES, _G_WEIGHTS, _G_ERRORS, _G_HITS
+    _G_FM = fm
+    _G_REFERENCE = reference
     _G_QUERIES = queries
+    _G_WEIGHTS = weights
+    _G_ERRORS = errors
+    _G_HITS = hits
 
 
 # =========================================================
 # dna5 normalization (match SeqAn3 dna5): map non-ACGTN -> N
 # =========================================================
-_DNA5_KEEP = set("ACGTN")
+# one 256-entry table: ACGTN kept, acgtn upper-cased, every other byte -> N
+_DNA5_TABLE = bytes(
+    c if c in b"ACGTN" else (c - 32 if c in b"acgtn" else ord("N"))
+    for c in range(256)
+)
 
 
-def to_dna5_str(seq: str) -> str:
-    s = seq.strip().upper()
-    if not s:
-        return ""
-    return "".join(ch if ch in _DNA5_KEEP else "N" for ch in s)
+def to_dna5_bytes(seq: bytes) -> bytes:
+    return seq.translate(_DNA5_TABLE)
 
 
 # =========================================================
 # FASTA reader (supports .gz)
 # =========================================================
+_FASTA_BLOCK = 1 << 22
+_SEQ_WS = b" \t\x0b\x0c"  # whitespace bytes.strip() drops besides line breaks
+
+
+def _parse_fasta_block(buf: bytes, chunks: List[bytes], out: List[bytes]) -> None:
+    """
+    Parse whole lines in buf: sequence bytes of the open record go to chunks,
+    finished (normalized) records are appended to out.
+
+    Runs of sequence lines between headers are handled in one piece: a single translate drops
+    the line breaks. Only runs that contain other blanks fall back to per-line strip().
+    """
+    pos, n = 0, len(buf)
+    while pos < n:
+        if buf[pos] == 0x3E:  # '>' header
+            if chunks:
+                out.append(to_dna5_bytes(b"".join(chunks)))
+                chunks.clear()
+            nl = buf.find(b"\n", pos)
+            pos = n if nl == -1 else nl + 1
+            continue
+        nxt = buf.find(b"\n>", pos)
+        end = n if nxt == -1 else nxt + 1
+        seg = buf[pos:end].translate(None, b"\n")
+        if len(seg.translate(None, _SEQ_WS)) == len(seg):
+            if seg:
+                chunks.append(seg)
+        else:
+            for line in buf[pos:end].split(b"\n"):
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith(b">"):
+                    if chunks:
+                        out.append(to_dna5_bytes(b"".join(chunks)))
+                        chunks.clear()
+                else:
+                    chunks.append(line)
+        pos = end
+
+
+def _universal_newlines(buf: bytes) -> bytes:
+    # same line breaks as text mode: \r\n and a lone \r both end a line
+    if b"\r" in buf:
+        buf = buf.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    return buf
+
+
+def _records_from_blocks(f) -> Iterable[bytes]:
+    chunks: List[bytes] = []
+    out: List[bytes] = []
+    pending: List[bytes] = []  # bytes after the last newline seen so far
+    for block in iter(lambda: f.read(_FASTA_BLOCK), b""):
+        cut = block.rfind(b"\n") + 1
+        if cut == 0:
+            pending.append(block)
+            continue
+        pending.append(block[:cut])
+        _parse_fasta_block(_universal_newlines(b"".join(pending)), chunks, out)
+        pending = [block[cut:]]
+        yield from out
+        out.clear()
+    _parse_fasta_block(_universal_newlines(b"".join(pending)), chunks, out)
+    if chunks:
+        out.append(to_dna5_bytes(b"".join(chunks)))
+    yield from out
+
+
+def iter_fasta_records(path: str) -> Iterable[bytes]:
+    """
+    Yield every record as dna5-normalized ASCII bytes.
+
+    Input is read in 4 MiB binary blocks and never decoded; normalization is a single
+    translate per record. Uncompressed files are mmap'ed so the OS pages them in.
+    """
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            yield from _records_from_blocks(f)
+    elif os.path.getsize(path) > 0:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from _records_from_blocks(mm)
+
+
 def iter_fasta_sequences(path: str) -> Iterable[str]:
-    opener = gzip.open if path.endswith(".gz") else open
-    with opener(path, "rt") as f:
-        seq_chunks: List[str] = []
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith(">"):
-                if seq_chunks:
-                    yield to_dna5_str("".join(seq_chunks))
-                    seq_chunks = []
-            else:
-                seq_chunks.append(line)
-        if seq_chunks:
-            yield to_dna5_str("".join(seq_chunks))
-
-
-def load_reference(path: str) -> List[str]:
-    ref = list(iter_fasta_sequences(path))
+    for rec in iter_fasta_records(path):
+        yield rec.decode("ascii")
+
+
+def load_reference(path: str) -> List[bytes]:
+    # bytes end-to-end: divsufsort, bytes.find and iv2py all take bytes, so no str copy is ever built
+    ref = list(iter_fasta_records(path))
     if not ref:
         raise RuntimeError(f"Empty reference: {path}")
     return ref
@@ -99,15 +298,12 @@ def load_queries(path: str) -> List[str]:
 # =========================================================
 # Duplicate queries (match your C++ doubling logic)
 # while size < n: resize(2*old); copy old block once
+# doubling a block is the same as cycling the original list, so take the first n of the cycle
 # =========================================================
 def duplicate_to_n_cppstyle(items: List[str], n: int) -> List[str]:
     if n <= 0 or not items:
         return []
-    out = list(items)
-    while len(out) < n:
-        old = len(out)
-        out.extend(out[:old])
-    return out[:n]
+    return list(islice(cycle(items), n))
 
 
 # =========================================================
@@ -141,15 +337,40 @@ def chunk_ranges(n: int, workers: int, min_block: int = 64) -> List[Tuple[int, i
     return rs
 
 
+def pool_chunksize(n_ranges: int, workers: int) -> int:
+    """
+    Ranges handed to a pool worker per dispatch: ~4 dispatches per worker keeps the tail balanced
+    without paying a round trip for every block.
+    """
+    return max(1, n_ranges // (max(1, workers) * 4))
+
+
 # =========================================================
 # NAIVE (count all occurrences)
 # =========================================================
-def count_occurrences_naive(text: str, query: str) -> int:
+def _has_border(query: bytes) -> bool:
     """
-    Count all occurrences (including overlaps) using str.find loop.
+    True if a proper prefix of query equals a suffix, i.e. two matches can overlap.
+    """
+    m = len(query)
+    for p in range(1, m):
+        if query.startswith(query[p:]):
+            return True
+    return False
+
+
+def count_occurrences_naive(text: bytes, query: bytes) -> int:
+    """
+    Count all occurrences (including overlaps).
+
+    - Queries that cannot overlap themselves (no border, e.g. any length-1 query) are counted
+      by bytes.count entirely in C; the result is identical to the overlapping count.
+    - Otherwise fall back to a bytes.find loop, advancing by one after each hit.
     """
     if not query or len(query) > len(text):
         return 0
+    if not _has_border(query):
+        return text.count(query)
     total = 0
     start = 0
     while True:
@@ -161,81 +382,360 @@ def count_occurrences_naive(text: str, query: str) -> int:
     return total
 
 
-def _proc_worker_naive_range(b: int, e: int) -> int:
-    assert _G_TEXT is not None and _G_QUERIES is not None
+# the filter costs ~1.5 text scans whatever the hit count; the find loop costs one scan plus a
+# Python step per hit, so the filter only wins on dense hits (hg38_partial: m <= 4 faster, m = 5 a tie,
+# read-length queries 20-60% slower)
+_NAIVE_SIMD_MAX_M = 4
+# text positions scanned per vectorized step (bounds the temporary masks)
+_NAIVE_SIMD_BLOCK = 1 << 18
+
+
+def count_occurrences_naive_simd(arr, pat: bytes) -> int:
+    """
+    Count all occurrences (including overlaps) with a first/last byte filter (Mula's SIMD strstr):
+
+    - compare arr[i] == pat[0] and arr[i+m-1] == pat[-1] for a whole block of start positions,
+    - AND the masks, then verify the surviving candidates one inner position at a time,
+      again vectorized over the (quickly shrinking) candidate set.
+    """
+    m = len(pat)
+    n = arr.size
+    if m == 0 or m > n:
+        return 0
+    if m == 1:
+        return int(np.count_nonzero(arr == pat[0]))
+
+    first, last = pat[0], pat[-1]
+    n_starts = n - m + 1
+    total = 0
+    for b in range(0, n_starts, _NAIVE_SIMD_BLOCK):
+        e = min(n_starts, b + _NAIVE_SIMD_BLOCK)
+        mask = arr[b:e] == first
+        mask &= arr[b + m - 1:e + m - 1] == last
+        cand = np.flatnonzero(mask)
+        if cand.size == 0:
+            continue
+        cand += b
+        for j in range(1, m - 1):
+            cand = cand[arr[cand + j] == pat[j]]
+            if cand.size == 0:
+                break
+        total += int(cand.size)
+    return total
+
+
+def _proc_worker_naive_range(r: Tuple[int, int]) -> None:
+    b, e = r
+    assert _G_TEXT_B is not None and _G_Q_MV is not None
     s = 0
     for i in range(b, e):
-        s += count_occurrences_naive(_G_TEXT, _G_QUERIES[i])
-    return s
+        q = _query_bytes(i)
+        # border-free queries are a single bytes.count; self-overlapping ones use the find loop
+        # unless they are short enough to hit densely (see _NAIVE_SIMD_MAX_M)
+        if _G_TEXT_ARR is not None and len(q) <= _NAIVE_SIMD_MAX_M and _has_border(q):
+            s += count_occurrences_naive_simd(_G_TEXT_ARR, q)
+        else:
+            s += count_occurrences_naive(_G_TEXT_B, q)
+    _add_hits(s)
 
 
 # =========================================================
 # SUFFIX ARRAY (divsufsort), packed uint32
 # =========================================================
-def build_sa_packed(text: str) -> Tuple[bytes, int]:
+SA_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "implementing_search")
+
+
+def build_sa_u32(text: bytes):
     if not HAS_DIVSUFSORT:
         raise RuntimeError("suffixarray mode requires pydivsufsort. Install: pip install pydivsufsort")
-    sa = divsufsort(text.encode("ascii"))
-    n = len(sa)
-    buf = bytearray(n * 4)
-    for i, v in enumerate(sa):
-        struct.pack_into("<I", buf, i * 4, int(v))
-    return bytes(buf), n
+    sa = divsufsort(text)
+    # divsufsort returns an int32/int64 ndarray: one C cast + copy instead of a per-element pack loop
+    return np.asarray(sa, dtype=np.uint32)
 
 
-def _sa_u32(sa_bytes: bytes, idx: int) -> int:
-    return struct.unpack_from("<I", sa_bytes, idx * 4)[0]
+def sa_cache_path(text: bytes) -> str:
+    return os.path.join(SA_CACHE_DIR, hashlib.blake2b(text, digest_size=16).hexdigest() + ".sa.u32")
 
 
-def _lower_bound(text: str, sa_bytes: bytes, sa_n: int, pat: str) -> int:
-    lo, hi = 0, sa_n
-    m = len(pat)
+def load_or_build_sa(text: bytes, use_cache: bool):
+    """
+    SA of text as uint32. With use_cache (--sa_cache) it is memory-mapped from the on-disk cache keyed
+    by the text hash; a missing (or truncated) cache file is rebuilt with divsufsort and written atomically.
+    Returns (sa, cache path or None when in memory only, loaded from cache?).
+    """
+    if not use_cache:
+        return build_sa_u32(text), None, False
+    path = sa_cache_path(text)
+    if os.path.exists(path) and os.path.getsize(path) == 4 * len(text):
+        return np.memmap(path, dtype=np.uint32, mode="r", shape=(len(text),)), path, True
+    sa = build_sa_u32(text)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(SA_CACHE_DIR, exist_ok=True)
+        sa.tofile(tmp)
+        os.replace(tmp, path)
+    except OSError as ex:
+        print(f"[warn] SA cache not written ({ex}); keeping the suffix array in memory", file=sys.stderr)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        return sa, None, False
+    del sa
+    return np.memmap(path, dtype=np.uint32, mode="r", shape=(len(text),)), path, False
+
+
+def _lower_bound(tb, sa, pb: bytes) -> Tuple[int, int]:
+    """
+    First SA index whose suffix prefix is >= pb, plus the smallest mid seen with prefix > pb
+    (an upper limit for the following upper-bound search).
+    """
+    lo, hi = 0, len(sa)
+    ub_hi = hi
+    m = len(pb)
     while lo < hi:
         mid = (lo + hi) // 2
-        pos = _sa_u32(sa_bytes, mid)
-        s = text[pos:pos + m]
-        if s < pat:
+        pos = sa[mid]
+        # memoryview slice is a view; bytes() makes the single m-byte copy the compare needs
+        s = bytes(tb[pos:pos + m])
+        if s < pb:
             lo = mid + 1
         else:
             hi = mid
-    return lo
+            if s != pb:
+                ub_hi = mid
+    return lo, ub_hi
 
 
-def _upper_bound(text: str, sa_bytes: bytes, sa_n: int, pat: str, start: int) -> int:
-    lo, hi = start, sa_n
-    m = len(pat)
+def _upper_bound(tb, sa, pb: bytes, lo: int, hi: int) -> int:
+    m = len(pb)
     while lo < hi:
         mid = (lo + hi) // 2
-        pos = _sa_u32(sa_bytes, mid)
-        s = text[pos:pos + m]
-        if s <= pat:
+        pos = sa[mid]
+        if bytes(tb[pos:pos + m]) <= pb:
             lo = mid + 1
         else:
             hi = mid
     return lo
 
 
-def count_occurrences_sa(text: str, sa_bytes: bytes, sa_n: int, pat: str) -> int:
-    if not pat:
+def count_occurrences_sa(tb, sa_u32, pb: bytes) -> int:
+    """
+    Python fallback: tb is the text (bytes / memoryview), sa_u32 the suffix array (any int sequence),
+    pb the query already encoded to bytes by the caller (no per-step encoding).
+    """
+    if not pb:
         return 0
-    lb = _lower_bound(text, sa_bytes, sa_n, pat)
-    ub = _upper_bound(text, sa_bytes, sa_n, pat, lb)
+    lb, ub_hi = _lower_bound(tb, sa_u32, pb)
+    ub = _upper_bound(tb, sa_u32, pb, lb, ub_hi)
     return ub - lb
 
 
-def _proc_worker_sa_range(b: int, e: int) -> int:
-    assert _G_TEXT is not None and _G_SA_BYTES is not None and _G_QUERIES is not None
+# ---- numba path: same binary search over dna5 text packed 2 symbols / byte ----
+# order-preserving codes: A < C < G < N < T as in ASCII, so packed compares agree with the SA order
+_DNA5_CODE_TABLE = bytes.maketrans(b"ACGNT", bytes([0, 1, 2, 3, 4]))
+
+
+_PACK_CHUNK = 1 << 26  # symbols translated per step (even), bounds pack_dna5's temporaries
+
+
+def pack_dna5(text: bytes):
+    """
+    Pack dna5 text as 4-bit codes, symbol 2i in the low nibble of byte i and 2i+1 in the high one.
+    The buffer is zero-padded to whole uint64 words plus one spare word, so 16-symbol word loads
+    (.view(np.uint64)) never run past the end. Returns (packed uint8 array, number of symbols).
+    Works in chunks of _PACK_CHUNK symbols, so beyond the n/2-byte result only one chunk is live.
+    """
+    n = len(text)
+    nbytes = (n + 1) // 2
+    packed = np.zeros(((nbytes + 7) // 8 + 1) * 8, dtype=np.uint8)
+    for off in range(0, n, _PACK_CHUNK):
+        codes = np.frombuffer(text[off:off + _PACK_CHUNK].translate(_DNA5_CODE_TABLE), dtype=np.uint8)
+        half = codes.size // 2
+        dst = packed[off // 2:off // 2 + half]
+        dst[:] = codes[1:2 * half:2]
+        dst <<= 4
+        dst |= codes[0:2 * half:2]
+        if codes.size & 1:  # only possible in the last chunk
+            packed[off // 2 + half] = codes[-1]
+    return packed, n
+
+
+_NIB = np.uint64(0xF) if HAS_NUMPY else 0xF
+
+
+@njit(cache=True, boundscheck=False, fastmath=False)
+def _load_nibbles(words, p):
+    """
+    16 packed symbols starting at symbol p (funnel shift across two words for unaligned p).
+    """
+    w = p >> 4
+    sh = np.uint64((p & 15) * 4)
+    lo = words[w]
+    if sh == 0:
+        return lo
+    return (lo >> sh) | (words[w + 1] << (np.uint64(64) - sh))
+
+
+@njit(cache=True, boundscheck=False, fastmath=False)
+def _sa_cmp(text_w, n, pos, pat_w, m) -> int:
+    """
+    Compare text[pos:pos+m] with pat: -1 / 0 / 1 (a suffix shorter than m that matches sorts first).
+    XORs 16 symbols per uint64 and only walks nibbles inside the first differing word.
+    """
+    L = min(m, n - pos)
+    j = 0
+    while j < L:
+        tv = _load_nibbles(text_w, pos + j)
+        pv = pat_w[j >> 4]
+        x = tv ^ pv
+        rem = L - j
+        if rem < 16:
+            x &= (np.uint64(1) << np.uint64(4 * rem)) - np.uint64(1)
+        if x != 0:
+            sh = np.uint64(0)
+            while ((x >> sh) & _NIB) == 0:
+                sh += np.uint64(4)
+            return -1 if ((tv >> sh) & _NIB) < ((pv >> sh) & _NIB) else 1
+        j += 16
+    return -1 if L < m else 0
+
+
+@njit(cache=True, boundscheck=False, fastmath=False)
+def _sa_lower_bound(text_w, n, sa_u32, pat_w, m, lo, hi) -> int:
+    while lo < hi:
+        mid = (lo + hi) >> 1
+        if _sa_cmp(text_w, n, np.int64(sa_u32[mid]), pat_w, m) < 0:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+@njit(cache=True, boundscheck=False, fastmath=False)
+def _sa_upper_bound(text_w, n, sa_u32, pat_w, m, lo, hi) -> int:
+    while lo < hi:
+        mid = (lo + hi) >> 1
+        if _sa_cmp(text_w, n, np.int64(sa_u32[mid]), pat_w, m) <= 0:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+# ---- bucket index: SA range of every k-mer, so the binary search starts log2(5^k) levels deep ----
+SA_BUCKET_MAX_K = 10  # 5^10 buckets -> ~39 MB of uint32 starts
+
+
+def sa_bucket_k(n: int) -> int:
+    """
+    Largest k <= SA_BUCKET_MAX_K with 5^k <= n / 4 (at least 1), so the table stays well below the SA.
+    """
+    k = 1
+    while k < SA_BUCKET_MAX_K and 5 ** (k + 1) * 4 <= n:
+        k += 1
+    return k
+
+
+@njit(cache=True, boundscheck=False)
+def _kmer_counts(text_packed, n, k, counts) -> None:
+    """
+    counts[b] += 1 for the base-5 k-mer key b at every text position (rolling key, one pass).
+    Suffixes shorter than k are keyed with A (0) padding, which puts them first in their bucket,
+    exactly where the SA has them; the zero padding of pack_dna5 supplies those codes.
+    """
+    P = counts.shape[0]
+    key = 0
+    for p in range(n + k - 1):
+        key = (key * 5 + np.int64((text_packed[p >> 1] >> ((p & 1) * 4)) & 0xF)) % P
+        if p >= k - 1:
+            counts[key] += 1
+
+
+def build_sa_buckets(text_packed, n: int, k: int):
+    """
+    bucket_start (uint32, 5^k + 1 entries): SA indices [bucket_start[b], bucket_start[b+1]) hold the
+    suffixes whose first k symbols encode to b. Keys follow SA order, so a prefix sum of the k-mer
+    counts is enough; the SA itself is never scanned.
+    """
+    counts = np.zeros(5 ** k, dtype=np.uint32)
+    _kmer_counts(text_packed, n, k, counts)
+    bucket_start = np.zeros(5 ** k + 1, dtype=np.uint32)
+    np.cumsum(counts, out=bucket_start[1:])
+    return bucket_start
+
+
+@njit(cache=True, boundscheck=False, fastmath=False)
+def _bucket_range(bucket_start, k, pat_w, m):
+    """
+    SA range holding every suffix that can start with pat: one bucket for m >= k, else the
+    5^(k-m) consecutive buckets sharing the pattern as prefix.
+    """
+    kk = min(m, k)
+    b = 0
+    for j in range(kk):
+        b = b * 5 + np.int64((pat_w[j >> 4] >> np.uint64(4 * (j & 15))) & _NIB)
+    span = 1
+    for _ in range(kk, k):
+        b *= 5
+        span *= 5
+    return np.int64(bucket_start[b]), np.int64(bucket_start[b + span])
+
+
+@njit(cache=True, boundscheck=False, fastmath=False)
+def count_occurrences_sa_nb(text_w, n, sa_u32, bucket_start, k, pat_w, m) -> int:
+    if m == 0:
+        return 0
+    lo, hi = _bucket_range(bucket_start, k, pat_w, m)
+    lb = _sa_lower_bound(text_w, n, sa_u32, pat_w, m, lo, hi)
+    ub = _sa_upper_bound(text_w, n, sa_u32, pat_w, m, lb, hi)
+    return ub - lb
+
+
+@njit(cache=True, parallel=True, nogil=True)
+def sa_count_batch(text_w, n, sa_u32, bucket_start, k, q_words, q_woff, q_len, out) -> None:
+    """
+    out[i] = occurrences of query i, packed in q_words[q_woff[i]:q_woff[i+1]] with q_len[i] symbols.
+    One call for the whole query set; numba threads split the range.
+    """
+    for i in prange(out.shape[0]):
+        out[i] = count_occurrences_sa_nb(
+            text_w, n, sa_u32, bucket_start, k, q_words[q_woff[i]:q_woff[i + 1]], q_len[i]
+        )
+
+
+def pack_queries(queries: List[str]):
+    """
+    Pack every query as dna5 nibbles starting on its own uint64 word.
+    Returns (q_words uint64, q_woff int64 word offsets with len(queries) + 1 entries, q_len int64).
+    """
+    qs_bytes = [q.encode("ascii") for q in queries]
+    codes = np.frombuffer(b"".join(qs_bytes).translate(_DNA5_CODE_TABLE), dtype=np.uint8)
+    q_len = np.fromiter(map(len, qs_bytes), dtype=np.int64, count=len(qs_bytes))
+    q_woff = np.zeros(len(qs_bytes) + 1, dtype=np.int64)
+    np.cumsum((q_len + 15) // 16, out=q_woff[1:])
+    src_off = np.zeros(len(qs_bytes) + 1, dtype=np.int64)
+    np.cumsum(q_len, out=src_off[1:])
+    # nibble slot of every code: 16 * (first word of its query) + index within the query
+    dest = np.repeat(16 * q_woff[:-1] - src_off[:-1], q_len) + np.arange(codes.size)
+    nib = np.zeros(16 * int(q_woff[-1]), dtype=np.uint8)
+    nib[dest] = codes
+    packed = nib[0::2] | (nib[1::2] << 4)
+    return packed.view(np.uint64), q_woff, q_len
+
+
+def _proc_worker_sa_range(r: Tuple[int, int]) -> None:
+    b, e = r
+    assert _G_TEXT_MV is not None and _G_SA_MV is not None and _G_Q_MV is not None
     s = 0
     for i in range(b, e):
-        s += count_occurrences_sa(_G_TEXT, _G_SA_BYTES, _G_SA_N, _G_QUERIES[i])
-    return s
+        s += count_occurrences_sa(_G_TEXT_MV, _G_SA_MV, _query_bytes(i))
+    _add_hits(s)
 
 
 # =========================================================
 # FM-index via IV2py
 # =========================================================
 class IVFM:
-    def __init__(self, reference_records: List[str], sampling_rate: int = 16):
+    def __init__(self, reference_records: List[bytes], sampling_rate: int = 16):
         if not HAS_IV2PY:
             raise RuntimeError("fmindex modes require iv2py. Install: pip install iv2py")
         self.reference = reference_records
@@ -244,32 +744,93 @@ class IVFM:
     def search_all(self, pattern: str, k: int = 0):
         return self.index.search(pattern, k=int(k))
 
+    def count_all(self, patterns: List[str], k: int = 0) -> int:
+        """
+        Total hit count over many patterns in one call.
+
+        iv2py has no bulk search, so the batching is on our side: map/sum drive the loop in C and
+        the bound search method is looked up once, leaving only the pybind11 call per pattern.
+        """
+        return sum(map(len, map(self.index.search, patterns, repeat(int(k)))))
+
 
 # =========================================================
 # Pigeon helpers
 # =========================================================
-@dataclass(frozen=True)
-class CandidateKey:
-    ref_id: int
-    start: int
-
-
-def verify_hamming(text: str, query: str, start_pos: int, max_errors: int) -> bool:
-    if start_pos < 0:
-        return False
-    end = start_pos + len(query)
-    if end > len(text):
-        return False
-    errors = 0
-    for i, ch in enumerate(query):
-        if text[start_pos + i] != ch:
-            errors += 1
-            if errors > max_errors:
-                return False
-    return True
-
-
-def count_verified_hits_pigeon(reference: List[str], fm: IVFM, query: str, errors: int) -> int:
+# candidate (ref_id, start) packed into one int: 24 bits of record id, 40 bits of position
+_CAND_POS_BITS = 40
+_CAND_POS_MASK = (1 << _CAND_POS_BITS) - 1
+_CAND_REF_MASK = (1 << 24) - 1
+
+
+@functools.lru_cache(maxsize=None)
+def _byte_lsb_mask(m: int) -> int:
+    # 0x0101...01 over m bytes
+    return int.from_bytes(b"\x01" * m, "little")
+
+
+def _hamming_ok(window: int, qi: int, mask: int, max_errors: int) -> bool:
+    """
+    Window and query as little-endian ints (mask = _byte_lsb_mask(m)): XOR, fold every nonzero byte
+    onto its low bit, then one popcount gives the mismatch count (exact for any byte, N included).
+    """
+    x = window ^ qi
+    x |= x >> 4
+    x |= x >> 2
+    x |= x >> 1
+    return (x & mask).bit_count() <= max_errors
+
+
+# candidates per vectorized block (bounds the (block, m) gather)
+_HAMMING_BATCH = 4096
+# below this many candidates the early-exit loop beats the numpy call overhead
+_HAMMING_NUMPY_MIN = 8
+
+
+def count_hamming_hits(text: bytes, query: bytes, starts: List[int], max_errors: int) -> int:
+    """
+    Number of starts where text[start:start+m] is within max_errors substitutions of query.
+    Larger candidate sets are compared as one (candidates, m) gather + != per block.
+    """
+    m = len(query)
+    if not HAS_NUMPY or len(starts) < _HAMMING_NUMPY_MIN:
+        # query int and byte mask built once per query
+        qi = int.from_bytes(query, "little")
+        mask = _byte_lsb_mask(m)
+        n = len(text)
+        return sum(
+            1 for st in starts
+            if 0 <= st and st + m <= n and _hamming_ok(int.from_bytes(text[st:st + m], "little"), qi, mask, max_errors)
+        )
+    text_u8 = np.frombuffer(text, dtype=np.uint8)
+    q_u8 = np.frombuffer(query, dtype=np.uint8)
+    st = np.asarray(starts, dtype=np.int64)
+    st = st[(st >= 0) & (st + m <= text_u8.size)]
+    cols = np.arange(m)
+    hits = 0
+    for b in range(0, st.size, _HAMMING_BATCH):
+        window = text_u8[st[b:b + _HAMMING_BATCH, None] + cols]
+        mismatches = np.count_nonzero(window != q_u8, axis=1)
+        hits += int(np.count_nonzero(mismatches <= max_errors))
+    return hits
+
+
+def _fm_part_hits(fm: IVFM, part: str) -> List[Tuple[int, int]]:
+    """
+    Exact FM hits of one pigeon part as (ref_id, hit_pos) pairs.
+    Not memoized: duplicate queries are already collapsed by the caller, and parts of distinct
+    reads almost never repeat, so a cache would only retain hit lists.
+    """
+    hits = []
+    for res in fm.search_all(part, k=0):
+        try:
+            hits.append((int(res[0]), int(res[1])))
+        except Exception:
+            continue
+    return hits
+
+
+def count_verified_hits_pigeon(reference: List[bytes], fm: IVFM, query: str, errors: int) -> int:
     if not query:
         return 0
     if errors <= 0:
@@ -279,8 +840,10 @@ def count_verified_hits_pigeon(reference: List[str], fm: IVFM, query: str, error
     k = min(errors + 1, m)
     b = [(i * m) // k for i in range(k + 1)]
 
-    seen: Set[CandidateKey] = set()
-    hits = 0
+    qb = query.encode("ascii")
+    seen: Set[int] = set()
+    seen_add = seen.add
+    cands: Dict[int, List[int]] = {}  # ref_id -> candidate starts, verified per record below
 
     for part_id in range(k):
         pb, pe = b[part_id], b[part_id + 1]
@@ -290,41 +853,44 @@ def count_verified_hits_pigeon(reference: List[str], fm: IVFM, query: str, error
         if not part:
             continue
 
-        for res in fm.search_all(part, k=0):
-            try:
-                ref_id, hit_pos = int(res[0]), int(res[1])
-            except Exception:
-                continue
-
+        for ref_id, hit_pos in _fm_part_hits(fm, part):
             start = hit_pos - pb
             if start < 0:
                 continue
 
-            key = CandidateKey(ref_id, start)
+            key = ((ref_id & _CAND_REF_MASK) << _CAND_POS_BITS) | (start & _CAND_POS_MASK)
             if key in seen:
                 continue
-            seen.add(key)
+            seen_add(key)
 
-            if 0 <= ref_id < len(reference) and verify_hamming(reference[ref_id], query, start, errors):
-                hits += 1
+            if 0 <= ref_id < len(reference):
+                cands.setdefault(ref_id, []).append(start)
 
-    return hits
+    return sum(count_hamming_hits(reference[ref_id], qb, starts, errors) for ref_id, starts in cands.items())
 
 
 def _thread_worker_fm_count(fm: IVFM, queries: List[str], k: int, b: int, e: int) -> int:
-    s = 0
-    for i in range(b, e):
-        s += len(fm.search_all(queries[i], k=k))
-    return s
+    return fm.count_all(queries[b:e], k=k)
 
 
-def _thread_worker_pigeon(reference: List[str], fm: IVFM, queries: List[str], errors: int, b: int, e: int) -> int:
+def _thread_worker_pigeon(reference: List[bytes], fm: IVFM, queries: List[str], weights: List[int],
+                         errors: int, b: int, e: int) -> int:
     s = 0
     for i in range(b, e):
-        s += count_verified_hits_pigeon(reference, fm, queries[i], errors)
+        s += weights[i] * count_verified_hits_pigeon(reference, fm, queries[i], errors)
     return s
 
 
+def _proc_worker_fm_count(r: Tuple[int, int]) -> None:
+    assert _G_FM is not None and _G_QUERIES is not None
+    _add_hits(_thread_worker_fm_count(_G_FM, _G_QUERIES, _G_ERRORS, r[0], r[1]))
+
+
+def _proc_worker_pigeon(r: Tuple[int, int]) -> None:
+    assert _G_FM is not None and _G_REFERENCE is not None and _G_QUERIES is not None and _G_WEIGHTS is not None
+    _add_hits(_thread_worker_pigeon(_G_REFERENCE, _G_FM, _G_QUERIES, _G_WEIGHTS, _G_ERRORS, r[0], r[1]))
+
+
 # =========================================================
 # Main
 # =========================================================
@@ -339,6 +905,9 @@ def main():
     ap.add_argument("--sampling_rate", type=int, default=16, help="IV2py FM samplingRate")
     ap.add_argument("--min_block", type=int, default=64, help="min queries per task explaining process pool overhead")
     ap.add_argument("--verbose", action="store_true", help="print partition info")
+    ap.add_argument("--sa_cache", action="store_true",
+                    help=f"suffixarray: reuse / store the SA under {SA_CACHE_DIR} "
+                         "(4 bytes per text symbol, never evicted)")
     args = ap.parse_args()
 
     # ---- load queries first (small), then reference ----
@@ -354,31 +923,58 @@ def main():
 
     # IMPORTANT memory fix:
     # Do NOT keep both:
-    #   - reference_records (list of strings) AND
-    #   - concat_text (one giant string)
+    #   - reference_records (list of bytes) AND
+    #   - concat_text (one giant bytes object)
     # at the same time unless the mode needs it.
-    concat_text: Optional[str] = None
+    concat_text: Optional[bytes] = None
 
     if args.mode in ("naive", "suffixarray"):
-        sep = "N" * 50
-        concat_text = sep.join(reference_records) if len(reference_records) > 1 else reference_records[0]
+        # a single record is returned as-is by bytes.join (no copy)
+        concat_text = (b"N" * 50).join(reference_records)
         # free list to reduce baseline RSS
         del reference_records
         reference_records = []  # type: ignore
         gc.collect()
 
     # ---- index construction ----
-    sa_bytes: Optional[bytes] = None
+    sa_path: Optional[str] = None
     sa_n: int = 0
+    shm_text: Optional[shared_memory.SharedMemory] = None
+    shm_sa: Optional[shared_memory.SharedMemory] = None
     fm: Optional[IVFM] = None
 
     if args.mode == "suffixarray":
         assert concat_text is not None
         t0 = time.perf_counter()
-        sa_bytes, sa_n = build_sa_packed(concat_text)
+        sa_u32, sa_path, sa_loaded = load_or_build_sa(concat_text, args.sa_cache)
+        sa_n = int(sa_u32.shape[0])
+        if HAS_NUMBA:
+            # packed text and k-mer buckets are part of the numba index, so they count as construction
+            text_packed, text_n = pack_dna5(concat_text)
+            bucket_k = sa_bucket_k(text_n)
+            bucket_start = build_sa_buckets(text_packed, text_n, bucket_k)
+            # the numba search only reads the packed text (the SA cache key is already computed)
+            concat_text = None
         t1 = time.perf_counter()
+        # construction time is only comparable across runs with the same SA source
+        if sa_loaded:
+            print(f"SA: loaded from cache {sa_path}", flush=True)
+        else:
+            print("SA: built" + (f", cached to {sa_path}" if sa_path else ""), flush=True)
         print(f"Index Construction time: {t1 - t0} seconds.", flush=True)
 
+        if HAS_NUMBA:
+            # single process, numba threads: text/SA are views, nothing is copied per worker
+            numba.set_num_threads(min(threads, numba.config.NUMBA_NUM_THREADS))
+            text_w = text_packed.view(np.uint64)
+            # compile (or load from cache) before the timed search; queries are packed inside the timer,
+            # like share_queries in the pool modes
+            sa_count_batch(
+                text_w, text_n, sa_u32, bucket_start, bucket_k,
+                np.zeros(0, dtype=np.uint64), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.int64),
+            )
+
     elif args.mode in ("fmindex", "fmindex_pigeon"):
         t0 = time.perf_counter()
         fm = IVFM(reference_records, sampling_rate=args.sampling_rate)
@@ -390,49 +986,87 @@ def main():
     # ---- search phase ----
     t0 = time.perf_counter()
     total_hits = 0
+    hits = mp.Value("q", 0, lock=True)  # summed by pool workers (process modes)
 
-    ranges = chunk_ranges(len(queries), threads, min_block=max(1, int(args.min_block)))
+    uq: List[str] = queries
+    weights: List[int] = []
+    if args.mode == "fmindex_pigeon":
+        # duplicated queries (duplicate_to_n_cppstyle) are searched once and weighted by multiplicity
+        uniq = Counter(queries)
+        uq, weights = list(uniq.keys()), list(uniq.values())
+    # ranges over the queries actually dispatched (unique ones in pigeon mode)
+    ranges = chunk_ranges(len(uq), threads, min_block=max(1, int(args.min_block)))
     if args.verbose:
-        print(f"[DEBUG] queries={len(queries)} threads={threads} min_block={args.min_block} blocks={len(ranges)}",
-              flush=True)
+        uniq_info = f" unique={len(uq)}" if args.mode == "fmindex_pigeon" else ""
+        print(f"[DEBUG] queries={len(queries)}{uniq_info} threads={threads} min_block={args.min_block} "
+              f"blocks={len(ranges)}", flush=True)
 
     if args.mode == "naive":
         assert concat_text is not None
-        with ProcessPoolExecutor(
-            max_workers=threads,
-            initializer=_init_text_queries_worker,
-            initargs=(concat_text, queries),
-        ) as ex:
-            futs = [ex.submit(_proc_worker_naive_range, b, e) for (b, e) in ranges]
-            for fu in as_completed(futs):
-                total_hits += fu.result()
+        shm_q, shm_qoff = share_queries(queries)
+        try:
+            with mp.Pool(threads, initializer=_init_text_queries_worker,
+                         initargs=(concat_text, shm_q.name, shm_qoff.name, len(queries), hits)) as pool:
+                drain_pool(pool, _proc_worker_naive_range, ranges, threads)
+            total_hits = hits.value
+        finally:
+            release_shared(shm_q, shm_qoff)
+
+    elif args.mode == "suffixarray" and HAS_NUMBA:
+        q_words, q_woff, q_len = pack_queries(queries)
+        out = np.zeros(len(queries), dtype=np.int64)
+        sa_count_batch(text_w, text_n, sa_u32, bucket_start, bucket_k, q_words, q_woff, q_len, out)
+        total_hits = int(out.sum())
 
     elif args.mode == "suffixarray":
-        assert concat_text is not None and sa_bytes is not None
-        with ProcessPoolExecutor(
-            max_workers=threads,
-            initializer=_init_sa_worker,
-            initargs=(concat_text, sa_bytes, sa_n, queries),
-        ) as ex:
-            futs = [ex.submit(_proc_worker_sa_range, b, e) for (b, e) in ranges]
-            for fu in as_completed(futs):
-                total_hits += fu.result()
+        assert concat_text is not None
+        # process pool: text lives once in shared memory, the SA in the mapped cache file (shared memory
+        # only without one); workers attach views. Copied inside the timer, like share_queries, since
+        # this replaces shipping text and SA to every worker
+        shm_text = shared_copy(concat_text)
+        if sa_path is None:
+            shm_sa = shared_copy(sa_u32)
+        del sa_u32
+        shm_q, shm_qoff = share_queries(queries)
+        try:
+            with mp.Pool(
+                threads,
+                initializer=_init_sa_worker,
+                initargs=(shm_text.name, len(concat_text), sa_path, shm_sa.name if shm_sa else None, sa_n,
+                          shm_q.name, shm_qoff.name, len(queries), hits),
+            ) as pool:
+                drain_pool(pool, _proc_worker_sa_range, ranges, threads)
+            total_hits = hits.value
+        finally:
+            release_shared(shm_text, shm_q, shm_qoff)
+            if shm_sa is not None:
+                release_shared(shm_sa)
 
     elif args.mode == "fmindex":
         assert fm is not None
         k = max(0, int(args.errors))
-        with ThreadPoolExecutor(max_workers=threads) as ex:
-            futs = [ex.submit(_thread_worker_fm_count, fm, queries, k, b, e) for (b, e) in ranges]
-            for fu in as_completed(futs):
-                total_hits += fu.result()
+        if FM_USE_FORK:
+            with mp.get_context("fork").Pool(threads, initializer=_init_fm_worker,
+                                             initargs=(fm, None, queries, None, k, hits)) as pool:
+                drain_pool(pool, _proc_worker_fm_count, ranges, threads)
+            total_hits = hits.value
+        else:
+            with ThreadPoolExecutor(max_workers=threads) as ex:
+                total_hits = sum(ex.map(lambda r: _thread_worker_fm_count(fm, queries, k, r[0], r[1]), ranges))
 
     else:  # fmindex_pigeon
         assert fm is not None
         emax = max(0, int(args.errors))
-        with ThreadPoolExecutor(max_workers=threads) as ex:
-            futs = [ex.submit(_thread_worker_pigeon, reference_records, fm, queries, emax, b, e) for (b, e) in ranges]
-            for fu in as_completed(futs):
-                total_hits += fu.result()
+        if FM_USE_FORK:
+            with mp.get_context("fork").Pool(threads, initializer=_init_fm_worker,
+                                             initargs=(fm, reference_records, uq, weights, emax, hits)) as pool:
+                drain_pool(pool, _proc_worker_pigeon, ranges, threads)
+            total_hits = hits.value
+        else:
+            with ThreadPoolExecutor(max_workers=threads) as ex:
+                total_hits = sum(ex.map(
+                    lambda r: _thread_worker_pigeon(reference_records, fm, uq, weights, emax, r[0], r[1]), ranges
+                ))
 
     t1 = time.perf_counter()
     print(f"Search time: {t1 - t0} seconds.", flush=True)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the script lives in src/ and is not an installed package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
@@ -0,0 +1,59 @@
+import gzip
+import io
+import random
+
+import pytest
+
+import implementing_search as isr
+
+
+# ---------- FASTA reader vs per-line text-mode parsing ----------
+def _per_line_records(data: bytes):
+    """
+    The original reader: universal-newline text lines, strip(), '>' starts a record, upper() + non-ACGTN -> N.
+    """
+    out, chunks = [], []
+    for line in io.StringIO(data.decode("ascii"), newline=None):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(">"):
+            if chunks:
+                out.append("".join(chunks))
+                chunks = []
+        else:
+            chunks.append(line)
+    if chunks:
+        out.append("".join(chunks))
+    return ["".join(c if c in "ACGTN" else "N" for c in s.upper()).encode("ascii") for s in out]
+
+
+def _random_fasta(rng: random.Random) -> bytes:
+    alphabet = "ACGTACGTNacgtnRy"
+    breaks = ["\n", "\r\n", "\r", "\n\n", " \n", "\t\r\n", "\x0b\n"]
+    parts = []
+    for _ in range(rng.randint(0, 5)):
+        if rng.random() < 0.8:
+            parts.append(">read " + "".join(rng.choice("xyz0 >") for _ in range(rng.randint(0, 6))))
+            parts.append(rng.choice(breaks))
+        for _ in range(rng.randint(0, 4)):
+            parts.append("".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30))))
+            parts.append(rng.choice(breaks))
+    if parts and rng.random() < 0.3:
+        parts.pop()  # no trailing line break
+    return "".join(parts).encode("ascii")
+
+
+@pytest.mark.parametrize("block", [1, 3, 7, 64, 1 << 22])
+def test_fasta_blocks_match_per_line_parsing(tmp_path, monkeypatch, block):
+    monkeypatch.setattr(isr, "_FASTA_BLOCK", block)
+    rng = random.Random(block)
+    for i in range(150):
+        data = _random_fasta(rng)
+        expected = _per_line_records(data)
+        plain = tmp_path / f"{i}.fa"
+        plain.write_bytes(data)
+        packed = tmp_path / f"{i}.fa.gz"
+        packed.write_bytes(gzip.compress(data))
+        assert list(isr.iter_fasta_records(str(plain))) == expected, data
+        assert list(isr.iter_fasta_records(str(packed))) == expected, data
@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+import implementing_search as isr
+
+
+def _count_brute(text: bytes, query: bytes) -> int:
+    return sum(text.startswith(query, i) for i in range(len(text))) if query else 0
+
+
+def _has_border_brute(query: bytes) -> bool:
+    return any(query[:p] == query[-p:] for p in range(1, len(query)))
+
+
+def _random_cases(seed: int, n_cases: int):
+    rng = random.Random(seed)
+    for _ in range(n_cases):
+        text = bytes(rng.choice(b"ACGTN" if rng.random() < 0.5 else b"AC") for _ in range(rng.randint(0, 400)))
+        for _ in range(10):
+            m = rng.randint(1, 9)
+            if text and rng.random() < 0.5:
+                p = rng.randrange(len(text))
+                yield text, text[p:p + m]
+            else:
+                yield text, bytes(rng.choice(b"AC") for _ in range(m))
+
+
+def test_has_border():
+    assert not isr._has_border(b"A")
+    assert isr._has_border(b"AA")
+    assert isr._has_border(b"ACGA")
+    assert isr._has_border(b"ACAC")
+    assert not isr._has_border(b"ACGT")
+    for _, q in _random_cases(1, 100):
+        assert isr._has_border(q) == _has_border_brute(q), q
+
+
+def test_count_occurrences_naive_counts_overlaps():
+    assert isr.count_occurrences_naive(b"AAAA", b"AA") == 3
+    assert isr.count_occurrences_naive(b"ACACA", b"ACA") == 2
+    assert isr.count_occurrences_naive(b"AC", b"ACG") == 0
+    for text, q in _random_cases(2, 200):
+        assert isr.count_occurrences_naive(text, q) == _count_brute(text, q), (text, q)
+
+
+def test_count_occurrences_naive_simd_matches_brute_force(monkeypatch):
+    np = pytest.importorskip("numpy")
+    monkeypatch.setattr(isr, "_NAIVE_SIMD_BLOCK", 16)  # many blocks, candidates across block edges
+    for text, q in _random_cases(3, 200):
+        arr = np.frombuffer(text, dtype=np.uint8)
+        assert isr.count_occurrences_naive_simd(arr, q) == _count_brute(text, q), (text, q)
@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+import implementing_search as isr
+
+
+def _mismatches(a: bytes, b: bytes) -> int:
+    return sum(x != y for x, y in zip(a, b))
+
+
+def _hits_brute(reference, query: bytes, errors: int) -> int:
+    m = len(query)
+    return sum(
+        _mismatches(rec[st:st + m], query) <= errors
+        for rec in reference
+        for st in range(len(rec) - m + 1)
+    )
+
+
+class _ExactFM:
+    """
+    Stand-in for IVFM: exact search by brute force, hits as (ref_id, pos) like iv2py.
+    """
+
+    def __init__(self, reference):
+        self.reference = reference
+
+    def search_all(self, pattern: str, k: int = 0):
+        assert k == 0
+        pb = pattern.encode("ascii")
+        return [
+            (ref_id, pos)
+            for ref_id, rec in enumerate(self.reference)
+            for pos in range(len(rec) - len(pb) + 1)
+            if rec.startswith(pb, pos)
+        ]
+
+
+def test_candidate_key_fields_do_not_collide():
+    pairs = [(0, 0), (0, 1), (1, 0), (0, isr._CAND_POS_MASK), (isr._CAND_REF_MASK, 0),
+             (isr._CAND_REF_MASK, isr._CAND_POS_MASK), (5, 12345678901)]
+    keys = {((r & isr._CAND_REF_MASK) << isr._CAND_POS_BITS) | (p & isr._CAND_POS_MASK) for r, p in pairs}
+    assert len(keys) == len(pairs)
+    for key, (r, p) in zip(sorted(keys), sorted(pairs)):
+        assert (key >> isr._CAND_POS_BITS, key & isr._CAND_POS_MASK) == (r, p)
+
+
+@pytest.mark.parametrize("errors", [1, 2, 3])
+def test_pigeon_counts_every_position_once(errors):
+    # repetitive records: many parts hit the same start, which the candidate keys must dedupe
+    rng = random.Random(errors)
+    for _ in range(20):
+        reference = [bytes(rng.choice(b"AAC" if i % 2 else b"ACGT") for _ in range(rng.randint(0, 150)))
+                     for i in range(rng.randint(1, 3))]
+        fm = _ExactFM(reference)
+        for _ in range(10):
+            rec = rng.choice(reference)
+            m = rng.randint(errors + 1, 16)
+            if len(rec) >= m and rng.random() < 0.7:
+                p = rng.randrange(len(rec) - m + 1)
+                q = bytearray(rec[p:p + m])
+                for j in rng.sample(range(m), rng.randint(0, errors)):
+                    q[j] = ord(rng.choice("ACGT"))
+                query = q.decode("ascii")
+            else:
+                query = "".join(rng.choice("ACGT") for _ in range(m))
+            got = isr.count_verified_hits_pigeon(reference, fm, query, errors)
+            assert got == _hits_brute(reference, query.encode("ascii"), errors), (reference, query)
+
+
+def _random_hamming_case(rng: random.Random, n_starts: int):
+    text = bytes(rng.choice(b"ACGTN") for _ in range(rng.randint(1, 300)))
+    m = rng.randint(1, 40)
+    query = bytes(rng.choice(b"ACGT") for _ in range(m))
+    # out-of-range starts (negative, running past the end) must be skipped, not counted
+    starts = [rng.randint(-3, len(text)) for _ in range(n_starts)]
+    return text, query, starts
+
+
+def _hamming_hits_brute(text: bytes, query: bytes, starts, errors: int) -> int:
+    m = len(query)
+    return sum(0 <= st and st + m <= len(text) and _mismatches(text[st:st + m], query) <= errors for st in starts)
+
+
+def test_count_hamming_hits_numpy_batches(monkeypatch):
+    pytest.importorskip("numpy")
+    monkeypatch.setattr(isr, "_HAMMING_BATCH", 5)  # several blocks per call
+    rng = random.Random(15)
+    for _ in range(200):
+        text, query, starts = _random_hamming_case(rng, rng.randint(isr._HAMMING_NUMPY_MIN, 40))
+        errors = rng.randint(0, 4)
+        assert isr.count_hamming_hits(text, query, starts, errors) == _hamming_hits_brute(text, query, starts, errors)
+
+
+def test_hamming_ok_counts_byte_mismatches():
+    rng = random.Random(23)
+    for _ in range(300):
+        m = rng.randint(1, 120)
+        a = bytes(rng.choice(b"ACGTN") for _ in range(m))
+        b = bytearray(a)
+        for j in rng.sample(range(m), rng.randint(0, min(m, 6))):
+            b[j] = rng.choice(b"ACGTNacgt\x00\xff")  # any byte, incl. ones sharing bits with the original
+        mism = _mismatches(a, bytes(b))
+        wi, qi, mask = int.from_bytes(bytes(b), "little"), int.from_bytes(a, "little"), isr._byte_lsb_mask(m)
+        assert isr._hamming_ok(wi, qi, mask, mism)
+        assert not isr._hamming_ok(wi, qi, mask, mism - 1)
+
+
+def test_count_hamming_hits_small_candidate_sets(monkeypatch):
+    monkeypatch.setattr(isr, "HAS_NUMPY", False)  # int popcount path for any candidate count
+    rng = random.Random(24)
+    for _ in range(300):
+        text, query, starts = _random_hamming_case(rng, rng.randint(0, 20))
+        errors = rng.randint(0, 4)
+        assert isr.count_hamming_hits(text, query, starts, errors) == _hamming_hits_brute(text, query, starts, errors)
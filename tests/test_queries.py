@@ -0,0 +1,20 @@
+import implementing_search as isr
+
+
+def _duplicate_doubling(items, n):
+    """
+    The original C++-style loop: while size < n, append a copy of everything so far; then truncate.
+    """
+    if n <= 0 or not items:
+        return []
+    out = list(items)
+    while len(out) < n:
+        out.extend(out[:len(out)])
+    return out[:n]
+
+
+def test_duplicate_to_n_matches_doubling():
+    for size in range(0, 7):
+        items = [f"q{i}" for i in range(size)]
+        for n in range(-1, 40):
+            assert isr.duplicate_to_n_cppstyle(items, n) == _duplicate_doubling(items, n), (size, n)
@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+import implementing_search as isr
+
+np = pytest.importorskip("numpy")
+
+
+# ---------- dna5 nibble packing ----------
+@pytest.mark.parametrize("chunk", [2, 6, 1 << 26])
+def test_pack_dna5_roundtrip(monkeypatch, chunk):
+    monkeypatch.setattr(isr, "_PACK_CHUNK", chunk)
+    rng = random.Random(chunk)
+    for n in range(0, 70):
+        text = bytes(rng.choice(b"ACGNT") for _ in range(n))
+        packed, pn = isr.pack_dna5(text)
+        assert pn == n
+        assert packed.size % 8 == 0 and packed.size >= (n + 1) // 2 + 8
+        nib = np.empty(2 * packed.size, dtype=np.uint8)
+        nib[0::2] = packed & 0xF
+        nib[1::2] = packed >> 4
+        assert nib[:n].tobytes() == text.translate(isr._DNA5_CODE_TABLE)
+        assert not nib[n:].any()
+
+
+# ---------- SA search vs brute-force overlapping count ----------
+def _count_brute(text: bytes, query: bytes) -> int:
+    total, pos = 0, text.find(query)
+    while pos != -1:
+        total += 1
+        pos = text.find(query, pos + 1)
+    return total
+
+
+def _random_sa_case(rng: random.Random, trial: int):
+    n = rng.randint(1, 2000)
+    text = bytes(rng.choice(b"ACGTN" if trial % 2 else b"AC") for _ in range(n))
+    queries = []
+    for _ in range(40):
+        m = rng.randint(1, 20)
+        if rng.random() < 0.6:
+            p = rng.randrange(n)
+            queries.append(text[p:p + m].decode("ascii"))  # includes suffixes shorter than m
+        else:
+            queries.append("".join(rng.choice("ACGTN") for _ in range(m)))
+    return text, queries
+
+
+@pytest.mark.skipif(not isr.HAS_DIVSUFSORT, reason="needs pydivsufsort")
+def test_count_occurrences_sa_matches_brute_force():
+    rng = random.Random(5)
+    for trial in range(40):
+        text, queries = _random_sa_case(rng, trial)
+        sa = memoryview(isr.build_sa_u32(text))
+        for q in queries:
+            qb = q.encode("ascii")
+            assert isr.count_occurrences_sa(memoryview(text), sa, qb) == _count_brute(text, qb), (trial, q)
+
+
+@pytest.mark.skipif(not isr.HAS_DIVSUFSORT, reason="needs pydivsufsort")
+def test_sa_count_batch_matches_brute_force():
+    # numba kernel (or its plain-Python stand-in) with k-mer bucket ranges, k random so that
+    # queries both longer and shorter than k are covered
+    rng = random.Random(7)
+    for trial in range(40):
+        text, queries = _random_sa_case(rng, trial)
+        sa = isr.build_sa_u32(text)
+        packed, text_n = isr.pack_dna5(text)
+        k = rng.randint(1, 6)
+        bucket_start = isr.build_sa_buckets(packed, text_n, k)
+        assert bucket_start[-1] == len(text)
+
+        q_words, q_woff, q_len = isr.pack_queries(queries)
+        out = np.zeros(len(queries), dtype=np.int64)
+        isr.sa_count_batch(packed.view(np.uint64), text_n, sa, bucket_start, k, q_words, q_woff, q_len, out)
+        assert out.tolist() == [_count_brute(text, q.encode("ascii")) for q in queries], (trial, k)